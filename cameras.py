@@ -1,3 +1,5 @@
+import functools
+
 import numpy as np
 from scipy.spatial.transform import Rotation as R
 import torch
@@ -127,6 +129,14 @@ class OrbitCamera:
         # pan in camera coordinate system (careful on the sensitivity!)
         self.center += 0.0005 * self.rot.as_matrix()[:3, :3] @ np.array([-dx, -dy, dz])
 
+# Projection matrices only depend on the frustum, which is fixed for most
+# renders, so share one device tensor per frustum instead of re-uploading it
+# for every camera. Callers must treat the result as read-only.
+@functools.lru_cache(maxsize=32)
+def projection_matrix_cuda(znear, zfar, fovx, fovy):
+    P = getProjectionMatrix(znear=znear, zfar=zfar, fovX=fovx, fovY=fovy)
+    return P.transpose(0, 1).cuda()
+
 class MiniCam:
     def __init__(self, c2w, width, height, fovy, fovx, znear, zfar, time=0, gs_convention=True):
         # c2w (pose) should be in NeRF convention.
@@ -146,12 +156,8 @@ class MiniCam:
             w2c[:3, 3] *= -1
 
         self.world_view_transform = torch.tensor(w2c).transpose(0, 1).cuda()
-        self.projection_matrix = (
-            getProjectionMatrix(
-                znear=self.znear, zfar=self.zfar, fovX=self.FoVx, fovY=self.FoVy
-            )
-            .transpose(0, 1)
-            .cuda()
+        self.projection_matrix = projection_matrix_cuda(
+            float(self.znear), float(self.zfar), float(self.FoVx), float(self.FoVy)
         )
         self.full_proj_transform = self.world_view_transform @ self.projection_matrix
         self.camera_center = -torch.tensor(c2w[:3, 3]).cuda()
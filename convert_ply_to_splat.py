@@ -1,90 +1,112 @@
 import argparse
 import os
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 
 try:
-    from plyfile import PlyData
-except ImportError:  # fallback for environments without plyfile
-    PlyData = None
-
-
-SH_C0 = 0.282095
-
-
-def sigmoid(x):
-    return 1.0 / (1.0 + np.exp(-x))
-
-
-def read_vertices(ply_path):
-    if PlyData is not None:
-        ply = PlyData.read(ply_path)
-        if "vertex" not in ply:
-            raise ValueError(f"Missing vertex data in {ply_path}")
-        return ply["vertex"].data
-
-    with open(ply_path, "rb") as f:
-        header_lines = []
-        while True:
-            line = f.readline()
-            if not line:
-                raise ValueError(f"Unexpected EOF in header: {ply_path}")
-            header_lines.append(line.decode("ascii", errors="ignore").strip())
-            if header_lines[-1] == "end_header":
-                break
-        header = header_lines
-        if "format binary_little_endian 1.0" not in header:
-            raise ValueError(f"Only binary_little_endian supported: {ply_path}")
-
-        vertex_count = None
-        properties = []
-        in_vertex = False
-        for line in header:
-            parts = line.split()
-            if not parts:
-                continue
-            if parts[0] == "element":
-                in_vertex = parts[1] == "vertex"
-                if in_vertex:
-                    vertex_count = int(parts[2])
-            elif parts[0] == "property" and in_vertex:
-                properties.append((parts[2], parts[1]))
-
-        if vertex_count is None:
-            raise ValueError(f"No vertex element in header: {ply_path}")
-
-        type_map = {
-            "float": "<f4",
-            "float32": "<f4",
-            "double": "<f8",
-            "uchar": "u1",
-            "uint8": "u1",
-            "char": "i1",
-            "int8": "i1",
-            "short": "<i2",
-            "int16": "<i2",
-            "ushort": "<u2",
-            "uint16": "<u2",
-            "int": "<i4",
-            "int32": "<i4",
-            "uint": "<u4",
-            "uint32": "<u4",
-        }
-
-        dtype = []
-        for name, ptype in properties:
-            if ptype not in type_map:
-                raise ValueError(f"Unsupported PLY type {ptype} in {ply_path}")
-            dtype.append((name, type_map[ptype]))
-
-        data = np.fromfile(f, dtype=np.dtype(dtype), count=vertex_count)
-        return data
-
-
-def convert_one(ply_path, splat_path):
-    v = read_vertices(ply_path)
-
+    import numba
+except ImportError:  # fallback for environments without numba
+    numba = None
+
+from ply_io import SH_C0, field_block, read_vertices, sigmoid
+
+
+@dataclass
+class Scratch:
+    # Work buffers reused across convert_one calls; frames of one sequence share
+    # a point count, so they are only reallocated when N changes.
+    n: int = -1
+    out: Optional[np.ndarray] = None
+    scale: Optional[np.ndarray] = None
+    quat: Optional[np.ndarray] = None
+    inv_norm: Optional[np.ndarray] = None
+    rgb: Optional[np.ndarray] = None
+    alpha: Optional[np.ndarray] = None
+
+    def ensure(self, n, work=True):
+        # work=False only sizes the output records (the Numba kernel needs no
+        # float work buffers).
+        if n != self.n:
+            self.n = n
+            self.out = np.empty((n, 32), dtype=np.uint8)
+            self.scale = None
+        if work and self.scale is None:
+            self.scale = np.empty((n, 3), dtype=np.float32)
+            self.quat = np.empty((n, 4), dtype=np.float32)
+            self.inv_norm = np.empty(n, dtype=np.float32)
+            self.rgb = np.empty((n, 3), dtype=np.float32)
+            self.alpha = np.empty(n, dtype=np.float32)
+        return self
+
+
+def _pack_records(xyz, scale, quat, fdc, opacity, scratch):
+    # Each splat record is 32 bytes: xyz (3 x f4), scale (3 x f4), rgba (4 x u1),
+    # rot (4 x u1). Fill contiguous byte columns instead of strided struct fields.
+    out = scratch.out
+    scale = np.exp(scale, out=scratch.scale)
+
+    # Inverse norm in place on one (N,) buffer, then a single broadcast multiply.
+    inv_norm = np.einsum("ij,ij->i", quat, quat, out=scratch.inv_norm)
+    np.maximum(inv_norm, 1e-16, out=inv_norm)
+    np.sqrt(inv_norm, out=inv_norm)
+    np.reciprocal(inv_norm, out=inv_norm)
+    quat = np.multiply(quat, inv_norm[:, None], out=scratch.quat)
+
+    rgb = np.multiply(fdc, SH_C0, out=scratch.rgb)
+    rgb += 0.5
+    np.clip(rgb, 0.0, 1.0, out=rgb)
+    rgb *= 255.0
+    rgb += 0.5
+
+    alpha = sigmoid(opacity, out=scratch.alpha)
+    np.clip(alpha, 0.0, 1.0, out=alpha)
+    alpha *= 255.0
+    alpha += 0.5
+
+    quat *= 128.0
+    quat += 128.0
+    np.clip(quat, 0.0, 255.0, out=quat)
+
+    out_f32 = out.view(np.float32)
+    out_f32[:, 0:3] = xyz
+    out_f32[:, 3:6] = scale
+    # Narrow straight into the record columns; no intermediate uint8 arrays.
+    np.copyto(out[:, 24:27], rgb, casting="unsafe")
+    np.copyto(out[:, 27], alpha, casting="unsafe")
+    np.copyto(out[:, 28:32], quat, casting="unsafe")
+
+
+if numba is not None:
+
+    @numba.njit(parallel=True, cache=True, fastmath=True)
+    def _pack_kernel(xyz, scale, quat, fdc, opacity, out_f32, out_u8):
+        # Same record layout as _pack_records, one point per iteration so every
+        # intermediate stays in registers. out_f32 and out_u8 alias the same rows.
+        sh_c0 = np.float32(SH_C0)
+        for i in numba.prange(xyz.shape[0]):
+            for k in range(3):
+                out_f32[i, k] = xyz[i, k]
+                out_f32[i, 3 + k] = np.exp(scale[i, k])
+                c = min(max(sh_c0 * fdc[i, k] + np.float32(0.5), 0.0), 1.0)
+                out_u8[i, 24 + k] = np.uint8(c * np.float32(255.0) + np.float32(0.5))
+
+            a = np.float32(1.0) / (np.float32(1.0) + np.exp(-opacity[i]))
+            a = min(max(a, 0.0), 1.0)
+            out_u8[i, 27] = np.uint8(a * np.float32(255.0) + np.float32(0.5))
+
+            norm = np.float32(0.0)
+            for k in range(4):
+                norm += quat[i, k] * quat[i, k]
+            inv = np.float32(1.0) / max(np.sqrt(norm), np.float32(1e-8))
+            for k in range(4):
+                r = quat[i, k] * inv * np.float32(128.0) + np.float32(128.0)
+                out_u8[i, 28 + k] = np.uint8(min(max(r, 0.0), 255.0))
+
+
+def splat_records(v, ply_path, scratch=None):
     required = [
         "x",
         "y",
@@ -105,64 +127,46 @@ def convert_one(ply_path, splat_path):
     if missing:
         raise ValueError(f"Missing fields in {ply_path}: {missing}")
 
-    xyz = np.stack([v["x"], v["y"], v["z"]], axis=1).astype(np.float32)
-    scale = np.stack([v["scale_0"], v["scale_1"], v["scale_2"]], axis=1).astype(
-        np.float32
-    )
-    scale = np.exp(scale)
+    xyz = field_block(v, ["x", "y", "z"])
+    scale = field_block(v, ["scale_0", "scale_1", "scale_2"])
+    quat = field_block(v, ["rot_0", "rot_1", "rot_2", "rot_3"])
+    fdc = field_block(v, ["f_dc_0", "f_dc_1", "f_dc_2"])
+    opacity = v["opacity"].astype(np.float32, copy=False)
+
+    if scratch is None:
+        scratch = Scratch()
+    scratch.ensure(xyz.shape[0], work=numba is None)
+    if numba is not None:
+        out = scratch.out
+        _pack_kernel(xyz, scale, quat, fdc, opacity, out.view(np.float32), out)
+    else:
+        _pack_records(xyz, scale, quat, fdc, opacity, scratch)
+    return scratch.out
+
+
+def convert_one(ply_path, splat_path, scratch=None):
+    out = splat_records(read_vertices(ply_path), ply_path, scratch)
+    os.makedirs(os.path.dirname(splat_path), exist_ok=True)
+    out.tofile(splat_path)
 
-    quat = np.stack([v["rot_0"], v["rot_1"], v["rot_2"], v["rot_3"]], axis=1).astype(
-        np.float32
-    )
-    quat_norm = np.linalg.norm(quat, axis=1, keepdims=True)
-    quat = quat / np.maximum(quat_norm, 1e-8)
-
-    fdc = np.stack([v["f_dc_0"], v["f_dc_1"], v["f_dc_2"]], axis=1).astype(np.float32)
-    rgb = np.clip(SH_C0 * fdc + 0.5, 0.0, 1.0)
-    rgb_u8 = (rgb * 255.0 + 0.5).astype(np.uint8)
-
-    alpha = sigmoid(v["opacity"].astype(np.float32))
-    alpha_u8 = (np.clip(alpha, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
-
-    rot_u8 = np.clip(quat * 128.0 + 128.0, 0, 255).astype(np.uint8)
-
-    dtype = np.dtype(
-        [
-            ("x", "<f4"),
-            ("y", "<f4"),
-            ("z", "<f4"),
-            ("sx", "<f4"),
-            ("sy", "<f4"),
-            ("sz", "<f4"),
-            ("r", "u1"),
-            ("g", "u1"),
-            ("b", "u1"),
-            ("a", "u1"),
-            ("rw", "u1"),
-            ("rx", "u1"),
-            ("ry", "u1"),
-            ("rz", "u1"),
-        ]
-    )
 
-    out = np.empty(xyz.shape[0], dtype=dtype)
-    out["x"] = xyz[:, 0]
-    out["y"] = xyz[:, 1]
-    out["z"] = xyz[:, 2]
-    out["sx"] = scale[:, 0]
-    out["sy"] = scale[:, 1]
-    out["sz"] = scale[:, 2]
-    out["r"] = rgb_u8[:, 0]
-    out["g"] = rgb_u8[:, 1]
-    out["b"] = rgb_u8[:, 2]
-    out["a"] = alpha_u8
-    out["rw"] = rot_u8[:, 0]
-    out["rx"] = rot_u8[:, 1]
-    out["ry"] = rot_u8[:, 2]
-    out["rz"] = rot_u8[:, 3]
+def convert_batch(ply_paths, splat_paths):
+    # Converts a whole sequence in one pass over the concatenated vertices, so
+    # the per-call overhead of each transform is paid once instead of per file.
+    # Returns False (writing nothing) if the files do not share one layout.
+    vertices = [read_vertices(p) for p in ply_paths]
+    if any(v.dtype != vertices[0].dtype for v in vertices):
+        return False
+    counts = [v.shape[0] for v in vertices]
+    out = splat_records(np.concatenate(vertices), ply_paths[0])
+    del vertices
 
-    os.makedirs(os.path.dirname(splat_path), exist_ok=True)
-    out.tofile(splat_path)
+    start = 0
+    for count, splat_path in zip(counts, splat_paths):
+        os.makedirs(os.path.dirname(splat_path), exist_ok=True)
+        out[start : start + count].tofile(splat_path)
+        start += count
+    return True
 
 
 def main():
@@ -177,6 +181,17 @@ def main():
         required=True,
         help="Directory to write .splat files.",
     )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Convert all files in a single vectorized pass.",
+    )
+    parser.add_argument(
+        "--batch_max_mb",
+        type=float,
+        default=2048,
+        help="Fall back to per-file conversion above this total input size.",
+    )
     args = parser.parse_args()
 
     input_dir = Path(args.input_dir)
@@ -185,9 +200,20 @@ def main():
     if not files:
         raise SystemExit(f"No .ply files found in {input_dir}")
 
-    for ply_path in files:
-        splat_path = output_dir / (ply_path.stem + ".splat")
-        convert_one(str(ply_path), str(splat_path))
+    splat_paths = [output_dir / (p.stem + ".splat") for p in files]
+    if args.batch:
+        total_mb = sum(p.stat().st_size for p in files) / 2**20
+        if total_mb <= args.batch_max_mb and convert_batch(
+            [str(p) for p in files], [str(p) for p in splat_paths]
+        ):
+            for splat_path in splat_paths:
+                print(f"Wrote {splat_path}")
+            return
+        print("Batch conversion not possible; converting per file.")
+
+    scratch = Scratch()
+    for ply_path, splat_path in zip(files, splat_paths):
+        convert_one(str(ply_path), str(splat_path), scratch)
         print(f"Wrote {splat_path}")
 
 
@@ -1,8 +1,10 @@
 import argparse
+import collections
 import os
 import pickle
 
 import numpy as np
+import numpy.lib.recfunctions as rfn
 import torch
 from omegaconf import OmegaConf
 from PIL import Image
@@ -11,11 +13,13 @@ from plyfile import PlyData, PlyElement
 from cameras import orbit_camera, OrbitCamera, MiniCam
 from gs_renderer_4d import Renderer
 
+# PLY frames whose device-to-host copies may be in flight at once; each holds
+# one set of pinned host buffers (about 44 bytes per Gaussian).
+PLY_INFLIGHT = 2
+
 
 def _as_tensor(value, device):
-    if torch.is_tensor(value):
-        return value.to(device)
-    return torch.tensor(value, device=device)
+    return torch.as_tensor(value, device=device)
 
 
 def _infer_video_len(global_motion_path, input_dir, default_T):
@@ -57,8 +61,9 @@ def _write_ply(model, path, xyz, scales, rotations, opacities):
         (xyz, normals, f_dc, f_rest, opacities, scales, rotations), axis=1
     )
     dtype_full = [(attribute, "f4") for attribute in model.construct_list_of_attributes()]
-    elements = np.empty(xyz.shape[0], dtype=dtype_full)
-    elements[:] = list(map(tuple, attributes))
+    elements = rfn.unstructured_to_structured(
+        np.ascontiguousarray(attributes, dtype=np.float32), dtype=np.dtype(dtype_full)
+    )
     PlyData([PlyElement.describe(elements, "vertex")]).write(path)
 
 
@@ -111,6 +116,23 @@ def main():
     os.makedirs(out_dir, exist_ok=True)
 
     times = np.linspace(args.start, T - 1, args.num_frames).round().astype(int)
+    # PLY readback goes through a small ring of pinned host buffers: a frame's
+    # copies are queued without syncing and an event marks when they land, so
+    # each frame is written while the GPU deforms the next one.
+    ply_pending = collections.deque()
+    ply_free = []
+
+    def _flush_ply(keep):
+        while len(ply_pending) > keep:
+            i, event, host = ply_pending.popleft()
+            event.synchronize()
+            _write_ply(
+                renderer.gaussians,
+                os.path.join(out_dir, f"frame_{i:03d}.ply"),
+                *(x.numpy() for x in host),
+            )
+            ply_free.append(host)
+
     for i, t in enumerate(times):
         if args.format in ("png", "both"):
             cam = OrbitCamera(opt.W, opt.H, r=opt.radius, fovy=opt.fovy)
@@ -131,9 +153,8 @@ def main():
                     direct_render=True,
                     account_for_global_motion=True,
                 )
-            image = outputs["image"].detach().cpu().numpy().astype(np.float32)
-            image = np.transpose(image, (1, 2, 0))
-            image = (image * 255.0).clip(0, 255).astype(np.uint8)
+            image = (outputs["image"].detach() * 255.0).clamp(0, 255).to(torch.uint8)
+            image = image.permute(1, 2, 0).contiguous().cpu().numpy()
             Image.fromarray(image).save(os.path.join(out_dir, f"frame_{i:03d}.png"))
 
         if args.format in ("ply", "both"):
@@ -146,14 +167,19 @@ def main():
                 translation_t = renderer.gaussian_translation[int(t)]
                 xyz = xyz * scale_t + translation_t
                 scales = scales * scale_t
-            _write_ply(
-                renderer.gaussians,
-                os.path.join(out_dir, f"frame_{i:03d}.ply"),
-                xyz.detach().cpu().numpy(),
-                scales.detach().cpu().numpy(),
-                rotations.detach().cpu().numpy(),
-                opacities.detach().cpu().numpy(),
-            )
+            _flush_ply(PLY_INFLIGHT - 1)
+            tensors = [x.detach() for x in (xyz, scales, rotations, opacities)]
+            if ply_free:
+                host = ply_free.pop()
+            else:
+                host = [torch.empty_like(x, device="cpu", pin_memory=True) for x in tensors]
+            for dst, src in zip(host, tensors):
+                dst.copy_(src, non_blocking=True)
+            event = torch.cuda.Event()
+            event.record()
+            ply_pending.append((i, event, host))
+
+    _flush_ply(0)
 
     print(f"Saved {len(times)} frames to {out_dir}")
 
@@ -0,0 +1,144 @@
+import functools
+import mmap
+import os
+
+import numpy as np
+
+try:
+    from plyfile import PlyData
+except ImportError:  # fallback for environments without plyfile
+    PlyData = None
+
+try:
+    from scipy.special import expit as sigmoid
+except ImportError:  # fallback for environments without scipy
+
+    def sigmoid(x, out=None):
+        out = np.negative(x, out=out)
+        np.exp(out, out=out)
+        out += 1.0
+        return np.reciprocal(out, out=out)
+
+
+SH_C0 = 0.282095
+
+
+def read_header(f, ply_path):
+    # Parses the header of a binary little-endian PLY whose first element is
+    # "vertex" with scalar properties, leaving f at the start of the vertex body.
+    header = []
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError(f"Unexpected EOF in header: {ply_path}")
+        header.append(line.decode("ascii", errors="ignore").strip())
+        if header[-1] == "end_header":
+            break
+    if "format binary_little_endian 1.0" not in header:
+        raise ValueError(f"Only binary_little_endian supported: {ply_path}")
+
+    vertex_count = None
+    properties = []
+    in_vertex = False
+    for line in header:
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == "element":
+            in_vertex = parts[1] == "vertex"
+            if in_vertex:
+                vertex_count = int(parts[2])
+            elif vertex_count is None and int(parts[2]) > 0:
+                raise ValueError(f"Vertex element is not first in {ply_path}")
+        elif parts[0] == "property" and in_vertex:
+            if parts[1] == "list":
+                raise ValueError(f"Unsupported list property in {ply_path}")
+            properties.append((parts[2], parts[1]))
+
+    if vertex_count is None:
+        raise ValueError(f"No vertex element in header: {ply_path}")
+
+    type_map = {
+        "float": "<f4",
+        "float32": "<f4",
+        "double": "<f8",
+        "uchar": "u1",
+        "uint8": "u1",
+        "char": "i1",
+        "int8": "i1",
+        "short": "<i2",
+        "int16": "<i2",
+        "ushort": "<u2",
+        "uint16": "<u2",
+        "int": "<i4",
+        "int32": "<i4",
+        "uint": "<u4",
+        "uint32": "<u4",
+    }
+
+    dtype = []
+    for name, ptype in properties:
+        if ptype not in type_map:
+            raise ValueError(f"Unsupported PLY type {ptype} in {ply_path}")
+        dtype.append((name, type_map[ptype]))
+    return vertex_count, np.dtype(dtype)
+
+
+def read_body(f, vertex_count, dtype, ply_path):
+    # Maps the vertex body instead of copying it: the returned read-only array
+    # keeps the mapping alive, and repeated reads are served from the page cache.
+    offset = f.tell()
+    size = vertex_count * dtype.itemsize
+    if os.fstat(f.fileno()).st_size < offset + size:
+        raise ValueError(f"Unexpected EOF in vertex data: {ply_path}")
+    if size == 0:
+        return np.empty(0, dtype=dtype)
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(mm, dtype=dtype, count=vertex_count, offset=offset)
+
+
+def read_vertices(ply_path):
+    # Binary little-endian files (everything we export) take the direct path;
+    # plyfile, when installed, handles any other layout.
+    with open(ply_path, "rb") as f:
+        try:
+            vertex_count, dtype = read_header(f, ply_path)
+        except ValueError:
+            if PlyData is None:
+                raise
+        else:
+            return read_body(f, vertex_count, dtype, ply_path)
+
+    ply = PlyData.read(ply_path)
+    if "vertex" not in ply:
+        raise ValueError(f"Missing vertex data in {ply_path}")
+    return ply["vertex"].data
+
+
+@functools.lru_cache(maxsize=None)
+def block_offset(dtype, names):
+    # Byte offset of names[0] when all of names are adjacent float32 fields of
+    # dtype, else None. Every frame of a sequence shares one dtype, so the layout
+    # is resolved once and reused for the remaining files.
+    fields = dtype.fields
+    offset = fields[names[0]][1]
+    for k, name in enumerate(names):
+        if fields[name][0] != np.dtype("<f4") or fields[name][1] != offset + 4 * k:
+            return None
+    return offset
+
+
+def field_block(v, names):
+    # Adjacent float32 fields (the usual Gaussian splatting layout) are exposed as
+    # a zero-copy (N, len(names)) strided view; anything else falls back to a copy.
+    offset = block_offset(v.dtype, tuple(names))
+    # An empty buffer cannot back a view at a non-zero offset, so N == 0 copies.
+    if offset is not None and v.flags.c_contiguous and v.shape[0] > 0:
+        return np.ndarray(
+            shape=(v.shape[0], len(names)),
+            dtype="<f4",
+            buffer=v,
+            offset=offset,
+            strides=(v.itemsize, 4),
+        )
+    return np.stack([v[name] for name in names], axis=1).astype(np.float32)
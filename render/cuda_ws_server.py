@@ -4,16 +4,21 @@ import io
 import json
 import os
 import pickle
-import time
 
 import numpy as np
 import torch
 from omegaconf import OmegaConf
 from PIL import Image
+from torchvision.io import encode_jpeg
 
 from cameras import MiniCam, look_at
 from gs_renderer_4d import Renderer
 
+try:
+    import simplejpeg
+except ImportError:  # optional faster JPEG encoder
+    simplejpeg = None
+
 try:
     import websockets
 except ImportError as exc:
@@ -42,10 +47,26 @@ def _infer_T(motion, fallback_T):
     return int(fallback_T)
 
 
+def _cuda_jpeg_supported():
+    # Recent torchvision encodes CUDA tensors with nvjpeg, so only the compressed
+    # bytes cross the bus. Probed once; older builds encode on the host instead.
+    try:
+        encode_jpeg(torch.zeros(3, 8, 8, dtype=torch.uint8, device="cuda"))
+    except (RuntimeError, TypeError):
+        return False
+    return True
+
+
 def _encode_image(image, fmt, quality):
+    # image: [H, W, C] uint8, C-contiguous. simplejpeg encodes the array directly
+    # when installed; PNG trades size for speed since frames are streamed.
+    if fmt == "jpeg" and simplejpeg is not None:
+        return simplejpeg.encode_jpeg(
+            image, quality=quality, colorspace="RGB", fastdct=True
+        )
     buffer = io.BytesIO()
     if fmt == "png":
-        Image.fromarray(image).save(buffer, format="PNG")
+        Image.fromarray(image).save(buffer, format="PNG", compress_level=1)
     else:
         Image.fromarray(image).save(buffer, format="JPEG", quality=quality)
     return buffer.getvalue()
@@ -81,13 +102,16 @@ class CudaStreamServer:
 
         if motion:
             device = torch.device("cuda")
-            self.renderer.gaussian_translation = torch.tensor(
+            self.renderer.gaussian_translation = torch.as_tensor(
                 motion["translation"], device=device
             )
-            self.renderer.gaussian_scale = torch.tensor(
+            self.renderer.gaussian_scale = torch.as_tensor(
                 motion["scale"], device=device
             )
 
+        self._last_cam = None
+        self.cuda_jpeg = self.format == "jpeg" and _cuda_jpeg_supported()
+
     def render(self, payload):
         W = int(payload.get("width", self.opt.W))
         H = int(payload.get("height", self.opt.H))
@@ -102,20 +126,28 @@ class CudaStreamServer:
         time_raw = payload.get("time", 0)
         time_idx = int(np.clip(round(float(time_raw)), 0, self.T - 1))
 
-        c2w = np.eye(4, dtype=np.float32)
-        c2w[:3, :3] = look_at(pos[None], target[None], opengl=True)[0]
-        c2w[:3, 3] = pos
-
-        cam = MiniCam(
-            c2w=c2w,
-            width=W,
-            height=H,
-            fovy=fovy,
-            fovx=fovx,
-            znear=znear,
-            zfar=zfar,
-            time=time_idx,
-        )
+        # An idle client keeps resending the same camera; reuse its device
+        # tensors instead of rebuilding and re-uploading them every frame.
+        cam_key = (W, H, fov, znear, zfar, time_idx, *pos.tolist(), *target.tolist())
+        cached = self._last_cam
+        if cached is not None and cached[0] == cam_key:
+            cam = cached[1]
+        else:
+            c2w = np.eye(4, dtype=np.float32)
+            c2w[:3, :3] = look_at(pos[None], target[None], opengl=True)[0]
+            c2w[:3, 3] = pos
+
+            cam = MiniCam(
+                c2w=c2w,
+                width=W,
+                height=H,
+                fovy=fovy,
+                fovx=fovx,
+                znear=znear,
+                zfar=zfar,
+                time=time_idx,
+            )
+            self._last_cam = (cam_key, cam)
 
         bg_color = None
         if self.transparent_bg:
@@ -132,10 +164,11 @@ class CudaStreamServer:
             alpha = outputs["alpha"].clamp(0, 1)
             alpha_safe = torch.clamp(alpha, min=1e-6)
             rgb = torch.where(alpha_safe > 1e-6, image / alpha_safe, torch.zeros_like(image))
-            rgba = torch.cat([rgb, alpha], dim=0)
-            image = (rgba * 255.0).byte().permute(1, 2, 0).cpu().numpy()
-        else:
-            image = (image * 255.0).byte().permute(1, 2, 0).cpu().numpy()
+            image = torch.cat([rgb, alpha], dim=0)
+        image = (image * 255.0).byte()
+        if self.cuda_jpeg:
+            return encode_jpeg(image, quality=self.quality).cpu().numpy().tobytes()
+        image = image.permute(1, 2, 0).contiguous().cpu().numpy()
         return _encode_image(image, self.format, self.quality)
 
 
@@ -150,25 +183,46 @@ async def handle_client(websocket, server):
     }
     await websocket.send(json.dumps(hello))
 
-    async for message in websocket:
-        if isinstance(message, bytes):
-            continue
-        try:
-            payload = json.loads(message)
-        except json.JSONDecodeError:
-            continue
-        if payload.get("type") != "camera":
-            continue
-
-        start = time.perf_counter()
-        try:
-            frame = server.render(payload)
-            await websocket.send(frame)
-        except Exception as exc:
-            err = {"type": "error", "message": str(exc)}
-            await websocket.send(json.dumps(err))
-        finally:
-            _ = time.perf_counter() - start
+    # Camera updates are coalesced: the reader only keeps the latest payload and
+    # the render loop picks it up when the previous frame is done, so fast
+    # camera drags never build a backlog.
+    latest = None
+    pending = asyncio.Event()
+
+    async def _render_loop():
+        nonlocal latest
+        send_task = None
+        while True:
+            await pending.wait()
+            pending.clear()
+            payload, latest = latest, None
+            try:
+                frame = await asyncio.to_thread(server.render, payload)
+            except Exception as exc:
+                frame = json.dumps({"type": "error", "message": str(exc)})
+            # Send in the background so the next render overlaps this send.
+            if send_task is not None:
+                try:
+                    await send_task
+                except websockets.ConnectionClosed:
+                    return
+            send_task = asyncio.create_task(websocket.send(frame))
+
+    render_task = asyncio.create_task(_render_loop())
+    try:
+        async for message in websocket:
+            if isinstance(message, bytes):
+                continue
+            try:
+                payload = json.loads(message)
+            except json.JSONDecodeError:
+                continue
+            if payload.get("type") != "camera":
+                continue
+            latest = payload
+            pending.set()
+    finally:
+        render_task.cancel()
 
 
 def main():
@@ -1,74 +1,45 @@
 import argparse
+import collections
+import itertools
 import json
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import numpy as np
 
-SH_C0 = 0.282095
-
-
-def sigmoid(x):
-    return 1.0 / (1.0 + np.exp(-x))
-
-
-def read_vertices(ply_path):
-    with open(ply_path, "rb") as f:
-        header_lines = []
-        while True:
-            line = f.readline()
-            if not line:
-                raise ValueError(f"Unexpected EOF in header: {ply_path}")
-            header_lines.append(line.decode("ascii", errors="ignore").strip())
-            if header_lines[-1] == "end_header":
-                break
-        header = header_lines
-        if "format binary_little_endian 1.0" not in header:
-            raise ValueError(f"Only binary_little_endian supported: {ply_path}")
-
-        vertex_count = None
-        properties = []
-        in_vertex = False
-        for line in header:
-            parts = line.split()
-            if not parts:
-                continue
-            if parts[0] == "element":
-                in_vertex = parts[1] == "vertex"
-                if in_vertex:
-                    vertex_count = int(parts[2])
-            elif parts[0] == "property" and in_vertex:
-                properties.append((parts[2], parts[1]))
-
-        if vertex_count is None:
-            raise ValueError(f"No vertex element in header: {ply_path}")
-
-        type_map = {
-            "float": "<f4",
-            "float32": "<f4",
-            "double": "<f8",
-            "uchar": "u1",
-            "uint8": "u1",
-            "char": "i1",
-            "int8": "i1",
-            "short": "<i2",
-            "int16": "<i2",
-            "ushort": "<u2",
-            "uint16": "<u2",
-            "int": "<i4",
-            "int32": "<i4",
-            "uint": "<u4",
-            "uint32": "<u4",
-        }
+try:
+    import numba
+except ImportError:  # fallback for environments without numba
+    numba = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ply_io import SH_C0, field_block, read_vertices, sigmoid
+
+
+# Storage dtypes for (delta, rgba, scale) per --delta_dtype. In int8 mode the
+# deltas carry a per-channel scale in meta.json and colors are stored as uint8.
+PACK_DTYPES = {
+    "fp32": (np.float32, np.float32, np.float32),
+    "fp16": (np.float16, np.float16, np.float16),
+    "int8": (np.int8, np.uint8, np.float16),
+}
 
-        dtype = []
-        for name, ptype in properties:
-            if ptype not in type_map:
-                raise ValueError(f"Unsupported PLY type {ptype} in {ply_path}")
-            dtype.append((name, type_map[ptype]))
 
-        data = np.fromfile(f, dtype=np.dtype(dtype), count=vertex_count)
-        return data
+if numba is not None:
+
+    # Serial on purpose: frames are already spread over the thread pool, and
+    # numba's workqueue layer aborts when parallel kernels run concurrently.
+    @numba.njit(cache=True, fastmath=True)
+    def _frame_kernel(fdc, opacity, log_scale, rgba, scale):
+        sh_c0 = np.float32(SH_C0)
+        for i in range(fdc.shape[0]):
+            for k in range(3):
+                c = sh_c0 * fdc[i, k] + np.float32(0.5)
+                rgba[i, k] = min(max(c, np.float32(0.0)), np.float32(1.0))
+                scale[i, k] = np.exp(log_scale[i, k])
+            rgba[i, 3] = np.float32(1.0) / (np.float32(1.0) + np.exp(-opacity[i]))
 
 
 def load_frame(ply_path):
@@ -77,31 +48,35 @@ def load_frame(ply_path):
     missing = [k for k in required if k not in v.dtype.names]
     if missing:
         raise ValueError(f"Missing fields in {ply_path}: {missing}")
-    pos = np.stack([v["x"], v["y"], v["z"]], axis=1).astype(np.float32)
+    pos = field_block(v, ["x", "y", "z"])
 
     has_fdc = all(k in v.dtype.names for k in ("f_dc_0", "f_dc_1", "f_dc_2"))
     has_opacity = "opacity" in v.dtype.names
     if not has_fdc or not has_opacity:
         raise ValueError(f"Missing color/opacity in {ply_path}")
 
-    fdc = np.stack([v["f_dc_0"], v["f_dc_1"], v["f_dc_2"]], axis=1).astype(np.float32)
-    color = np.clip(SH_C0 * fdc + 0.5, 0.0, 1.0)
-    opacity = sigmoid(v["opacity"].astype(np.float32)).reshape(-1, 1)
-
     has_scales = all(k in v.dtype.names for k in ("scale_0", "scale_1", "scale_2"))
     if not has_scales:
         raise ValueError(f"Missing scale in {ply_path}")
-    scale = np.stack([v["scale_0"], v["scale_1"], v["scale_2"]], axis=1).astype(
-        np.float32
-    )
-    scale = np.exp(scale)
 
-    rgba = np.concatenate([color, opacity], axis=1).astype(np.float32)
+    fdc = field_block(v, ["f_dc_0", "f_dc_1", "f_dc_2"])
+    opacity = v["opacity"].astype(np.float32, copy=False)
+    log_scale = field_block(v, ["scale_0", "scale_1", "scale_2"])
+    if numba is not None:
+        rgba = np.empty((pos.shape[0], 4), dtype=np.float32)
+        scale = np.empty((pos.shape[0], 3), dtype=np.float32)
+        _frame_kernel(fdc, opacity, log_scale, rgba, scale)
+    else:
+        color = np.clip(SH_C0 * fdc + 0.5, 0.0, 1.0)
+        rgba = np.concatenate([color, sigmoid(opacity).reshape(-1, 1)], axis=1)
+        rgba = rgba.astype(np.float32, copy=False)
+        scale = np.exp(log_scale)
+
     # Optional: load f_rest for SH1 (9 coeffs per channel)
     f_rest = None
     f_rest_fields = [f"f_rest_{i}" for i in range(27)]
     if all(name in v.dtype.names for name in f_rest_fields):
-        f_rest = np.stack([v[name] for name in f_rest_fields], axis=1).astype(np.float32)
+        f_rest = field_block(v, f_rest_fields)
     return pos, rgba, scale, f_rest
 
 
@@ -118,8 +93,35 @@ def main():
         help="Output directory for packed buffers.",
     )
     parser.add_argument("--fps", type=float, default=12.0, help="Playback FPS.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=min(8, os.cpu_count() or 1),
+        help="Number of threads used to parse PLY frames.",
+    )
+    parser.add_argument(
+        "--delta_dtype",
+        choices=sorted(PACK_DTYPES),
+        default="fp32",
+        help="Storage precision for delta/rgba/scale buffers.",
+    )
+    parser.add_argument(
+        "--device",
+        choices=["cpu", "cuda"],
+        default="cpu",
+        help="Device for the per-frame delta subtraction and cast.",
+    )
     args = parser.parse_args()
 
+    if args.device == "cuda":
+        # Imported here so CPU runs don't pay torch's startup cost.
+        try:
+            import torch
+        except ImportError:
+            torch = None
+        if torch is None or not torch.cuda.is_available():
+            raise SystemExit("CUDA not available; rerun with --device cpu.")
+
     input_dir = Path(args.input_dir)
     output_dir = Path(args.output_dir)
     files = sorted(p for p in input_dir.iterdir() if p.suffix.lower() == ".ply")
@@ -130,28 +132,6 @@ def main():
     n_points = pos0.shape[0]
     k_frames = len(files)
 
-    delta = np.zeros((k_frames, n_points, 4), dtype=np.float32)
-    delta[:, :, 3] = 0.0
-    rgba = np.zeros((k_frames, n_points, 4), dtype=np.float32)
-    scale = np.zeros((k_frames, n_points, 4), dtype=np.float32)
-    scale[:, :, 3] = 0.0
-    f_rest = None
-    if f_rest0 is not None:
-        f_rest = np.zeros((k_frames, n_points, 27), dtype=np.float32)
-
-    for i, ply_path in enumerate(files):
-        pos, frgba, sc, frest = load_frame(ply_path)
-        if pos.shape[0] != n_points:
-            raise ValueError(f"Point count mismatch in {ply_path}")
-        delta[i, :, :3] = pos - pos0
-        rgba[i, :, :4] = frgba
-        scale[i, :, :3] = sc
-        if f_rest is not None:
-            if frest is None:
-                raise ValueError(f"Missing f_rest in {ply_path}")
-            f_rest[i, :, :] = frest
-        print(f"Packed {ply_path.name}")
-
     os.makedirs(output_dir, exist_ok=True)
     pos0_path = output_dir / "pos0.bin"
     delta_path = output_dir / "delta.bin"
@@ -160,29 +140,142 @@ def main():
     f_rest_path = output_dir / "frest.bin"
     meta_path = output_dir / "meta.json"
 
-    pos0.tofile(pos0_path)
-    delta.tofile(delta_path)
-    rgba.tofile(rgba_path)
-    scale.tofile(scale_path)
-    if f_rest is not None:
-        f_rest.tofile(f_rest_path)
-
-    meta = {
-        "width": n_points,
-        "height": k_frames,
-        "points": n_points,
-        "frames": k_frames,
-        "fps": args.fps,
-        "rgba": "rgba.bin",
-        "scale": "scale.bin",
-        "frest": "frest.bin" if f_rest is not None else None,
-    }
-    meta_path.write_text(json.dumps(meta, indent=2))
+    delta_dtype, rgba_dtype, scale_dtype = PACK_DTYPES[args.delta_dtype]
+    quantize_delta = np.dtype(delta_dtype).kind == "i"
+    delta_staging_path = output_dir / "delta.staging.tmp"
+
+    # Frames are streamed straight into memory-mapped outputs so peak memory
+    # stays at roughly one frame instead of the whole (frames, points) tensors.
+    # delta and scale are stored tightly as xyz triplets; consumers that need
+    # vec4 alignment pad at upload time.
+    def _open(path, channels, dtype=np.float32):
+        return np.memmap(path, dtype=dtype, mode="w+", shape=(k_frames, n_points, channels))
+
+    # Every output is written under a .tmp name and only moved into place once
+    # all frames have packed, so a failed run never leaves partial buffers or a
+    # meta.json describing buffers of another dtype or size.
+    tmp_paths = {}
+
+    def _tmp(path):
+        tmp_paths[path] = path.with_name(path.name + ".tmp")
+        return tmp_paths[path]
+
+    try:
+        # Integer deltas need the global per-channel range, so they are staged as
+        # float32 and quantized in a second pass once every frame has been seen.
+        if quantize_delta:
+            delta = _open(delta_staging_path, 3)
+        else:
+            delta = _open(_tmp(delta_path), 3, delta_dtype)
+        rgba = _open(_tmp(rgba_path), 4, rgba_dtype)
+        scale = _open(_tmp(scale_path), 3, scale_dtype)
+        f_rest = None
+        if f_rest0 is not None:
+            f_rest = _open(_tmp(f_rest_path), 27)
+        delta_max = np.zeros(3, dtype=np.float32)
+
+        # On CUDA, pos0 stays resident and each frame is subtracted and narrowed to
+        # the staged delta dtype on the device, so only that result is copied back.
+        pos0_d = None
+        if args.device == "cuda":
+            pos0_d = torch.from_numpy(np.ascontiguousarray(pos0)).cuda()
+            staged_dtype = np.float32 if quantize_delta else delta_dtype
+            delta_dtype_d = (
+                torch.float16 if staged_dtype == np.float16 else torch.float32
+            )
+
+        # Frames are independent and parsing is mostly GIL-free NumPy/file I/O, so
+        # load them on a thread pool and write results back in frame order. Only
+        # about two frames per worker are kept in flight so memory stays bounded.
+        workers = max(1, args.workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = collections.deque()
+            remaining = iter(files[1:])
+            for ply_path in itertools.islice(remaining, 2 * workers):
+                pending.append(executor.submit(load_frame, ply_path))
+            for i, ply_path in enumerate(files):
+                if i == 0:
+                    # files[0] was already loaded to size the outputs; reuse it.
+                    pos, frgba, sc, frest = pos0, rgba0, scale0, f_rest0
+                else:
+                    pos, frgba, sc, frest = pending.popleft().result()
+                    for next_path in itertools.islice(remaining, 1):
+                        pending.append(executor.submit(load_frame, next_path))
+                if pos.shape[0] != n_points:
+                    raise ValueError(f"Point count mismatch in {ply_path}")
+                if pos0_d is not None:
+                    pos_d = torch.from_numpy(np.ascontiguousarray(pos)).cuda()
+                    d = (pos_d - pos0_d).to(delta_dtype_d).cpu().numpy()
+                else:
+                    d = pos - pos0
+                delta[i] = d
+                if quantize_delta:
+                    np.maximum(delta_max, np.abs(d).max(axis=0), out=delta_max)
+                if rgba_dtype == np.uint8:
+                    rgba[i, :, :4] = frgba * 255.0 + 0.5
+                else:
+                    rgba[i, :, :4] = frgba
+                scale[i] = sc
+                if f_rest is not None:
+                    if frest is None:
+                        raise ValueError(f"Missing f_rest in {ply_path}")
+                    f_rest[i, :, :] = frest
+                print(f"Packed {ply_path.name}")
+
+        delta_scale = None
+        if quantize_delta:
+            delta_scale = np.where(delta_max > 0, delta_max / 127.0, 1.0)
+            delta_scale = delta_scale.astype(np.float32)
+            staged = delta
+            delta = _open(_tmp(delta_path), 3, delta_dtype)
+            for i in range(k_frames):
+                q = np.rint(staged[i] / delta_scale)
+                delta[i] = np.clip(q, -127, 127)
+            del staged
+            os.remove(delta_staging_path)
+
+        pos0.tofile(_tmp(pos0_path))
+        for buf in (delta, rgba, scale, f_rest):
+            if buf is not None:
+                buf.flush()
+
+        meta = {
+            "width": n_points,
+            "height": k_frames,
+            "points": n_points,
+            "frames": k_frames,
+            "fps": args.fps,
+            "rgba": "rgba.bin",
+            "scale": "scale.bin",
+            "frest": "frest.bin" if f_rest is not None else None,
+            "delta_channels": 3,
+            "delta_stride": 3 * np.dtype(delta_dtype).itemsize,
+            "scale_channels": 3,
+            "delta_dtype": np.dtype(delta_dtype).name,
+            "delta_scale": delta_scale.tolist() if delta_scale is not None else None,
+            "rgba_dtype": np.dtype(rgba_dtype).name,
+            "scale_dtype": np.dtype(scale_dtype).name,
+        }
+        _tmp(meta_path).write_text(json.dumps(meta, indent=2))
+    except BaseException:
+        for path in [delta_staging_path, *tmp_paths.values()]:
+            if path.exists():
+                os.remove(path)
+        raise
+    del delta, rgba, scale, f_rest
+
+    # Drop the old meta.json first so a viewer never pairs it with new buffers.
+    if meta_path.exists():
+        os.remove(meta_path)
+    for path, tmp_path in tmp_paths.items():
+        if path != meta_path:
+            os.replace(tmp_path, path)
+    os.replace(tmp_paths[meta_path], meta_path)
     print(f"Wrote {pos0_path}")
     print(f"Wrote {delta_path}")
     print(f"Wrote {rgba_path}")
     print(f"Wrote {scale_path}")
-    if f_rest is not None:
+    if f_rest_path in tmp_paths:
         print(f"Wrote {f_rest_path}")
     print(f"Wrote {meta_path}")
 
@@ -150,6 +150,52 @@ async function loadBinary(url) {
   return res.arrayBuffer();
 }
 
+// Typed array and texture type per packed dtype (see pack_deltas.py
+// --delta_dtype). Narrow buffers are uploaded as stored: float16 as half-float
+// textures, uint8/int8 as normalized textures, so nothing is expanded on the CPU.
+const PACKED_TYPES = {
+  float32: [Float32Array, THREE.FloatType],
+  float16: [Uint16Array, THREE.HalfFloatType],
+  uint8: [Uint8Array, THREE.UnsignedByteType],
+  int8: [Int8Array, THREE.ByteType],
+};
+
+function packedArray(buffer, dtype) {
+  const [ArrayType] = PACKED_TYPES[dtype ?? "float32"];
+  return new ArrayType(buffer);
+}
+
+// Pads tightly packed xyz triplets to RGBA texels, keeping the element type.
+function padToVec4(src, channels) {
+  if (channels === 4) return src;
+  const count = src.length / channels;
+  const out = new src.constructor(count * 4);
+  for (let i = 0; i < count; i++) {
+    for (let c = 0; c < channels; c++) out[i * 4 + c] = src[i * channels + c];
+  }
+  return out;
+}
+
+function packedTexture(data, dtype, width, height) {
+  const [, type] = PACKED_TYPES[dtype ?? "float32"];
+  const texture = new THREE.DataTexture(
+    data,
+    width,
+    height,
+    THREE.RGBAFormat,
+    type
+  );
+  if (dtype === "int8") {
+    // Samples as q / 127; the vertex shader applies the per-channel scale.
+    texture.internalFormat = "RGBA8_SNORM";
+  }
+  texture.magFilter = THREE.NearestFilter;
+  texture.minFilter = THREE.NearestFilter;
+  texture.generateMipmaps = false;
+  texture.needsUpdate = true;
+  return texture;
+}
+
 async function main() {
   const meta = await fetch("./data/meta.json").then((r) => r.json());
   const pos0Buffer = await loadBinary("./data/pos0.bin");
@@ -162,49 +208,49 @@ async function main() {
   const pos0 = new Float32Array(pos0Buffer);
   const positions = new Float32Array(pos0.length);
   positions.set(pos0);
-  const rgba = new Float32Array(rgbaBuffer);
-  const scales = new Float32Array(scaleBuffer);
+  const deltas = padToVec4(
+    packedArray(deltaBuffer, meta.delta_dtype),
+    meta.delta_channels ?? 4
+  );
+  const rgba = packedArray(rgbaBuffer, meta.rgba_dtype);
+  const scales = padToVec4(
+    packedArray(scaleBuffer, meta.scale_dtype),
+    meta.scale_channels ?? 4
+  );
   const fRest = fRestBuffer ? new Float32Array(fRestBuffer) : null;
 
   const geometry = new THREE.BufferGeometry();
   geometry.setAttribute("position", new THREE.BufferAttribute(positions, 3));
-  geometry.setAttribute("color", new THREE.BufferAttribute(rgba, 4));
+  geometry.setAttribute(
+    "color",
+    meta.rgba_dtype === "float16"
+      ? new THREE.Float16BufferAttribute(rgba, 4)
+      : new THREE.BufferAttribute(rgba, 4, meta.rgba_dtype === "uint8")
+  );
 
-  const deltaTexture = new THREE.DataTexture(
-    new Float32Array(deltaBuffer),
+  const deltaTexture = packedTexture(
+    deltas,
+    meta.delta_dtype,
     meta.width,
-    meta.height,
-    THREE.RGBAFormat,
-    THREE.FloatType
+    meta.height
   );
-  deltaTexture.magFilter = THREE.NearestFilter;
-  deltaTexture.minFilter = THREE.NearestFilter;
-  deltaTexture.generateMipmaps = false;
-  deltaTexture.needsUpdate = true;
-
-  const rgbaTexture = new THREE.DataTexture(
-    new Float32Array(rgbaBuffer),
+  const rgbaTexture = packedTexture(
+    rgba,
+    meta.rgba_dtype,
     meta.width,
-    meta.height,
-    THREE.RGBAFormat,
-    THREE.FloatType
+    meta.height
   );
-  rgbaTexture.magFilter = THREE.NearestFilter;
-  rgbaTexture.minFilter = THREE.NearestFilter;
-  rgbaTexture.generateMipmaps = false;
-  rgbaTexture.needsUpdate = true;
-
-  const scaleTexture = new THREE.DataTexture(
-    new Float32Array(scaleBuffer),
+  const scaleTexture = packedTexture(
+    scales,
+    meta.scale_dtype,
     meta.width,
-    meta.height,
-    THREE.RGBAFormat,
-    THREE.FloatType
+    meta.height
   );
-  scaleTexture.magFilter = THREE.NearestFilter;
-  scaleTexture.minFilter = THREE.NearestFilter;
-  scaleTexture.generateMipmaps = false;
-  scaleTexture.needsUpdate = true;
+  // int8 deltas sample as q / 127 and are stored as q = delta / delta_scale.
+  const deltaScale =
+    meta.delta_dtype === "int8"
+      ? new THREE.Vector3(...meta.delta_scale).multiplyScalar(127)
+      : new THREE.Vector3(1, 1, 1);
 
   let frestTexture = null;
   if (fRest) {
@@ -237,6 +283,7 @@ async function main() {
     glslVersion: THREE.GLSL3,
     uniforms: {
       uDeltaTex: { value: deltaTexture },
+      uDeltaScale: { value: deltaScale },
       uRgbaTex: { value: rgbaTexture },
       uScaleTex: { value: scaleTexture },
       uFrestTex: { value: frestTexture },
@@ -252,6 +299,7 @@ async function main() {
     vertexShader: `
       precision highp float;
       uniform sampler2D uDeltaTex;
+      uniform vec3 uDeltaScale;
       uniform sampler2D uRgbaTex;
       uniform sampler2D uScaleTex;
       uniform sampler2D uFrestTex;
@@ -272,7 +320,7 @@ async function main() {
         vec4 c1 = texelFetch(uRgbaTex, ivec2(idx, uFrame1), 0);
         vec4 s0 = texelFetch(uScaleTex, ivec2(idx, uFrame0), 0);
         vec4 s1 = texelFetch(uScaleTex, ivec2(idx, uFrame1), 0);
-        vec3 pos = position + mix(d0.xyz, d1.xyz, uAlpha);
+        vec3 pos = position + mix(d0.xyz, d1.xyz, uAlpha) * uDeltaScale;
         vec3 sc = mix(s0.xyz, s1.xyz, uAlpha);
         gl_Position = uViewProj * vec4(pos, 1.0);
         gl_PointSize = uPointSize * (sc.x + sc.y + sc.z) / 3.0;
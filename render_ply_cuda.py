@@ -1,4 +1,5 @@
 import argparse
+import functools
 import os
 import sys
 
@@ -64,6 +65,12 @@ def get_projection_matrix(znear, zfar, fovx, fovy):
     return P
 
 
+@functools.lru_cache(maxsize=32)
+def projection_matrix_cuda(znear, zfar, fovx, fovy):
+    # Shared read-only device tensor per frustum; avoids a tiny H2D copy per camera.
+    return get_projection_matrix(znear, zfar, fovx, fovy).transpose(0, 1).cuda()
+
+
 class MiniCam:
     def __init__(self, c2w, width, height, fovy, fovx, znear, zfar):
         self.image_width = width
@@ -78,10 +85,8 @@ class MiniCam:
         w2c[:3, 3] *= -1
 
         self.world_view_transform = torch.tensor(w2c).transpose(0, 1).cuda()
-        self.projection_matrix = (
-            get_projection_matrix(self.znear, self.zfar, self.FoVx, self.FoVy)
-            .transpose(0, 1)
-            .cuda()
+        self.projection_matrix = projection_matrix_cuda(
+            float(self.znear), float(self.zfar), float(self.FoVx), float(self.FoVy)
         )
         self.full_proj_transform = self.world_view_transform @ self.projection_matrix
         self.camera_center = -torch.tensor(c2w[:3, 3]).cuda()
@@ -121,9 +126,8 @@ def main():
 
     with torch.no_grad():
         outputs = renderer.render(cur_cam, account_for_global_motion=False)
-    image = outputs["image"].detach().cpu().numpy().astype(np.float32)
-    image = np.transpose(image, (1, 2, 0))
-    image = (image * 255.0).clip(0, 255).astype(np.uint8)
+    image = (outputs["image"].detach() * 255.0).clamp(0, 255).to(torch.uint8)
+    image = image.permute(1, 2, 0).contiguous().cpu().numpy()
 
     os.makedirs(os.path.dirname(args.output), exist_ok=True)
     Image.fromarray(image).save(args.output)